@@ -0,0 +1,196 @@
+"""
+Hands resolved download URLs to aria2 (or anything speaking its JSON-RPC API)
+instead of moving the bytes ourselves with download_file.
+
+URLs are queued with add() and submitted in batches through system.multicall;
+wait() then polls aria2.tellStatus until every job has finished and writes the
+outcome back into the job dicts in Aria2Backend.jobs, and into the caller's
+result dict when one was passed to add().
+"""
+import os
+import time
+import itertools
+
+import requests
+
+
+STATUS_KEYS = ["gid", "status", "totalLength", "completedLength", "downloadSpeed", "errorMessage"]
+FINISHED = ("complete", "error", "removed")
+
+
+class Aria2Error(Exception):
+    pass
+
+
+class Aria2Client:
+    """Minimal aria2 JSON-RPC client."""
+
+    def __init__(self, rpc_url="http://localhost:6800/jsonrpc", secret=None, timeout=30):
+        self.rpc_url = rpc_url
+        self.secret = secret
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.ids = itertools.count(1)
+
+    def _params(self, method, params):
+        # system.* methods take no token; system.multicall carries it inside each call instead
+        if self.secret and not method.startswith("system."):
+            return [f"token:{self.secret}", *params]
+        return list(params)
+
+    def call(self, method, *params):
+        payload = {
+            "jsonrpc": "2.0",
+            "id": str(next(self.ids)),
+            "method": method,
+            "params": self._params(method, params),
+        }
+        response = self.session.post(self.rpc_url, json=payload, timeout=self.timeout)
+        try:
+            data = response.json()
+        except ValueError:
+            response.raise_for_status()
+            raise Aria2Error(f"Invalid RPC response from {self.rpc_url}")
+        if "error" in data:
+            raise Aria2Error(f"{method}: {data['error'].get('message')}")
+        return data["result"]
+
+    def multicall(self, calls):
+        """
+        calls: list of (method, params) tuples sent in one round trip.
+        Returns one entry per call: the result, or an Aria2Error for calls that failed.
+        """
+        batch = [{"methodName": method, "params": self._params(method, params)} for method, params in calls]
+        results = []
+        for entry in self.call("system.multicall", batch):
+            if isinstance(entry, dict):  # Faults come back as {"code": ..., "message": ...}
+                results.append(Aria2Error(entry.get("message", "Unknown error")))
+            else:
+                results.append(entry[0])
+        return results
+
+
+class Aria2Backend:
+    """Queues downloads and submits them to aria2 in batches."""
+
+    def __init__(self, client, headers=None, split=8, batch_size=50, max_delay=30.0):
+        """
+        max_delay: seconds the oldest queued job may wait before the batch is sent anyway,
+        so resolved links (which carry expiry tokens) do not sit idle until batch_size is reached.
+        """
+        self.client = client
+        self.headers = headers or {}
+        self.split = split
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.pending = []
+        self.jobs = []
+
+    def add(self, url, folder, filename, result=None):
+        """
+        Queues a download. Submits the queue once batch_size jobs are waiting
+        or the oldest one has waited max_delay seconds.
+        result: optional dict whose 'status'/'error' are updated when the job finishes.
+        """
+        job = {
+            "url": url,
+            "path": os.path.join(folder, filename),
+            "gid": None,
+            "status": "queued",
+            "completed": 0,
+            "total": 0,
+            "error": None,
+            "result": result,
+            "queued_at": time.monotonic(),
+        }
+        self.pending.append(job)
+        self.jobs.append(job)
+        oldest = time.monotonic() - self.pending[0]["queued_at"]
+        if len(self.pending) >= self.batch_size or oldest >= self.max_delay:
+            self.flush()
+        return job
+
+    def _options(self, job):
+        return {
+            # aria2 runs as its own process, so relative paths would resolve against its cwd
+            "dir": os.path.abspath(os.path.dirname(job["path"])),
+            "out": os.path.basename(job["path"]),
+            "split": str(self.split),
+            "max-connection-per-server": str(min(self.split, 16)),
+            "header": [f"{name}: {value}" for name, value in self.headers.items()],
+        }
+
+    def _update(self, job, status, error=None):
+        job["status"] = status
+        if error:
+            job["error"] = error
+        result = job["result"]
+        if result is not None and status in FINISHED:
+            result["status"] = "downloaded" if status == "complete" else "failed"
+            result["error"] = job["error"]
+
+    def flush(self):
+        """
+        Submits every queued job in a single system.multicall.
+        If the call itself fails, every job in the batch is marked as an error and the exception re-raised.
+        """
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        print(f"Submitting {len(batch)} download(s) to aria2...")
+        try:
+            results = self.client.multicall(
+                [("aria2.addUri", [[job["url"]], self._options(job)]) for job in batch]
+            )
+        except (requests.RequestException, Aria2Error) as e:
+            for job in batch:
+                self._update(job, "error", f"Submission failed: {e}")
+            raise
+        for job, result in zip(batch, results):
+            if isinstance(result, Aria2Error):
+                self._update(job, "error", str(result))
+                print(f"aria2 rejected {os.path.basename(job['path'])}: {result}")
+            else:
+                job["gid"] = result
+                job["status"] = "waiting"
+
+    def poll(self):
+        """Refreshes every unfinished job from aria2. Returns the number still running."""
+        running = [job for job in self.jobs if job["gid"] and job["status"] not in FINISHED]
+        if not running:
+            return 0
+        results = self.client.multicall(
+            [("aria2.tellStatus", [job["gid"], STATUS_KEYS]) for job in running]
+        )
+        for job, result in zip(running, results):
+            if isinstance(result, Aria2Error):
+                self._update(job, "error", str(result))
+                continue
+            job["completed"] = int(result.get("completedLength") or 0)
+            job["total"] = int(result.get("totalLength") or 0)
+            self._update(job, result.get("status", job["status"]), result.get("errorMessage"))
+        return sum(1 for job in running if job["status"] not in FINISHED)
+
+    def wait(self, interval=2.0, timeout=None):
+        """Flushes the queue and polls until every job finishes. Returns the job list."""
+        self.flush()
+        started = time.monotonic()
+        while True:
+            remaining = self.poll()
+            if not remaining:
+                break
+            if timeout is not None and time.monotonic() - started > timeout:
+                print(f"Stopped waiting with {remaining} download(s) still running in aria2.")
+                break
+            completed = sum(job["completed"] for job in self.jobs)
+            total = sum(job["total"] for job in self.jobs)
+            if total:
+                print(f"aria2: {remaining} running, {completed / total * 100:.1f}% of {total / (1024 * 1024):.1f} MB")
+            time.sleep(interval)
+
+        done = sum(1 for job in self.jobs if job["status"] == "complete")
+        print(f"aria2 finished {done}/{len(self.jobs)} download(s).")
+        for job in self.jobs:
+            if job["status"] != "complete":
+                print(f"  {os.path.basename(job['path'])}: {job['status']} {job['error'] or ''}".rstrip())
+        return self.jobs
@@ -0,0 +1,497 @@
+"""
+Multi-process batch runner for very large catalogs.
+
+The coordinator loads a job list (series and movie page URLs) into a SQLite
+queue and starts N worker processes, each with its own EgyDeadDL (HTTP pool +
+scheduler) and its own Playwright browser. Workers lease one item at a time
+and keep the lease alive with a heartbeat; if a worker dies its leases are
+handed back to the queue. Host windows and Retry-After pauses are kept in the
+queue DB too, so all workers back off a host together. Series are expanded
+into season items and seasons into episode items by whichever worker leases
+them. When the queue drains, every result is written to one JSON manifest.
+
+Job file: one page URL per line (optionally followed by a name), or JSON
+lines like {"url": "...", "name": "...", "kind": "series"}.
+
+Usage: python batch_runner.py jobs.txt --workers 4 [--action link] [--manifest manifest.json]
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import functools
+import multiprocessing
+from urllib.parse import unquote
+
+import main
+from egydead_dl import EgyDeadDL
+from throttle import Scheduler, DEFAULT_MAX_WINDOW
+from playwright.sync_api import sync_playwright, Error as PlaywrightError
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT
+);
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    slots REAL NOT NULL,
+    epoch INTEGER NOT NULL DEFAULT 0,
+    resume_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS host_slots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    host TEXT NOT NULL,
+    worker TEXT NOT NULL
+);
+"""
+
+
+class JobQueue:
+    """SQLite-backed work queue with leases. One instance per process/thread."""
+
+    def __init__(self, path, lease=60.0, max_attempts=3):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        # Autocommit mode; writes that must be atomic use BEGIN IMMEDIATE explicitly
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, kind, url, name):
+        """Adds an item unless its URL is already queued. Returns True if it was new."""
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO jobs (kind, url, name) VALUES (?, ?, ?)", (kind, url, name)
+        )
+        return cursor.rowcount == 1
+
+    def lease_next(self, worker):
+        """Leases the next pending (or abandoned) item to worker. Returns a row dict or None."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Items whose lease lapsed too many times are given up on
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'Lease expired too many times') "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = self.conn.execute(
+                "SELECT id, kind, url, name, attempts FROM jobs "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row:
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (worker, now + self.lease, row[0]),
+                )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        if not row:
+            return None
+        return {"id": row[0], "kind": row[1], "url": row[2], "name": row[3], "attempts": row[4] + 1}
+
+    def heartbeat(self, job_id, worker):
+        """Extends a lease. Returns False if the item is no longer leased to worker."""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + self.lease, job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker, result):
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (json.dumps(result), job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, worker, error, result=None):
+        """Puts the item back for another attempt, or marks it failed once attempts run out."""
+        self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, result = ?, lease_expires = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (self.max_attempts, error, json.dumps(result) if result else None, job_id, worker),
+        )
+
+    def release_worker(self, worker):
+        """Returns every item and host slot held by a dead worker to the queue."""
+        self.conn.execute("DELETE FROM host_slots WHERE worker = ?", (worker,))
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = 'Worker exited', lease_expires = NULL "
+            "WHERE worker = ? AND status = 'leased'",
+            (self.max_attempts, worker),
+        )
+        return cursor.rowcount
+
+    def clear_host_slots(self):
+        """Drops slots left behind by a previous run; nobody holds them anymore."""
+        self.conn.execute("DELETE FROM host_slots")
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def unfinished(self):
+        counts = self.counts()
+        return counts.get("pending", 0) + counts.get("leased", 0)
+
+    def rows(self):
+        cursor = self.conn.execute(
+            "SELECT id, kind, url, name, status, worker, attempts, error, result FROM jobs ORDER BY id"
+        )
+        columns = [c[0] for c in cursor.description]
+        items = []
+        for row in cursor.fetchall():
+            item = dict(zip(columns, row))
+            item["result"] = json.loads(item["result"]) if item["result"] else None
+            items.append(item)
+        return items
+
+
+class SharedHostLimiter:
+    """
+    HostLimiter whose window, in-flight slots and Retry-After pause live in the
+    queue DB, so every worker process backs off a host together instead of each
+    running its own window against it. Used from the worker's main thread only.
+    """
+
+    def __init__(self, queue, worker, host, initial=2, minimum=1, maximum=DEFAULT_MAX_WINDOW, poll=0.2):
+        self.conn = queue.conn
+        self.worker = worker
+        self.host = host
+        self.minimum = minimum
+        self.maximum = maximum
+        self.poll = poll
+        self.conn.execute(
+            "INSERT OR IGNORE INTO hosts (host, slots) VALUES (?, ?)",
+            (host, float(min(max(initial, minimum), maximum))),
+        )
+
+    def _state(self):
+        slots, epoch, resume_at = self.conn.execute(
+            "SELECT slots, epoch, resume_at FROM hosts WHERE host = ?", (self.host,)
+        ).fetchone()
+        active = self.conn.execute("SELECT COUNT(*) FROM host_slots WHERE host = ?", (self.host,)).fetchone()[0]
+        return slots, epoch, resume_at, active
+
+    def acquire(self):
+        """Blocks until a slot is free and the host is not paused. Returns a token for release()."""
+        while True:
+            now = time.time()
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                slots, epoch, resume_at, active = self._state()
+                token = None
+                if now >= resume_at and active < int(slots):
+                    cursor = self.conn.execute(
+                        "INSERT INTO host_slots (host, worker) VALUES (?, ?)", (self.host, self.worker)
+                    )
+                    token = (cursor.lastrowid, epoch)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            if token is not None:
+                return token
+            time.sleep(max(resume_at - now, self.poll))
+
+    def release(self, token, healthy, pause=None):
+        """Same rules as HostLimiter.release(), applied to the shared window."""
+        slot, token_epoch = token
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            slots, epoch, resume_at, active = self._state()
+            saturated = active >= int(slots)
+            self.conn.execute("DELETE FROM host_slots WHERE id = ?", (slot,))
+            if healthy and saturated:
+                slots = min(self.maximum, slots + 1.0 / slots)
+            elif healthy is False and token_epoch == epoch:
+                slots = max(self.minimum, slots / 2)
+                epoch += 1
+            if pause:
+                resume_at = max(resume_at, time.time() + pause)
+            self.conn.execute(
+                "UPDATE hosts SET slots = ?, epoch = ?, resume_at = ? WHERE host = ?",
+                (slots, epoch, resume_at, self.host),
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+
+def guess_kind(url):
+    return "series" if "/serie/" in url or "/season/" in url else "movie"
+
+
+def name_from_url(url):
+    return unquote(url.rstrip('/').split('/')[-1]).replace('-', ' ')
+
+
+def load_jobs(path):
+    """Reads a job file into (kind, url, name) tuples."""
+    jobs = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                url = entry['url']
+                jobs.append((entry.get('kind') or guess_kind(url), url, entry.get('name') or name_from_url(url)))
+            else:
+                url, _, name = line.partition(' ')
+                jobs.append((guess_kind(url), url, name.strip() or name_from_url(url)))
+    return jobs
+
+
+class Heartbeat(threading.Thread):
+    """Keeps the current item's lease alive while the worker is busy with it."""
+
+    def __init__(self, queue_path, worker, lease):
+        super().__init__(daemon=True)
+        self.queue_path = queue_path
+        self.worker = worker
+        self.lease = lease
+        self.interval = lease / 3
+        self.job_id = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        # sqlite3 connections cannot be shared across threads
+        queue = JobQueue(self.queue_path, lease=self.lease)
+        try:
+            while not self.stopped.wait(self.interval):
+                job_id = self.job_id
+                if job_id is not None:
+                    queue.heartbeat(job_id, self.worker)
+        finally:
+            queue.close()
+
+
+def item_folder(job):
+    """Episodes are grouped per series, movies share one folder."""
+    if job['kind'] == 'episode':
+        # Names come from the job file, so strip anything that would nest or break the path
+        return re.sub(r'[\\/*?:"<>|]', "", job['name'].rsplit('_Ep', 1)[0]).replace(' ', '_')
+    return ''
+
+
+def close_browser(browser):
+    """Closes a browser that may already be dead. Returns None for the caller to store."""
+    try:
+        browser.close()
+    except PlaywrightError:
+        pass
+    return None
+
+
+def worker_main(worker, queue_path, options):
+    """Entry point of a worker process."""
+    os.makedirs(options['log_dir'], exist_ok=True)
+    sys.stdout = open(os.path.join(options['log_dir'], f"{worker}.log"), 'a', encoding='utf-8', buffering=1)
+    sys.stderr = sys.stdout
+
+    queue = JobQueue(queue_path, lease=options['lease'], max_attempts=options['max_attempts'])
+    heartbeat = Heartbeat(queue_path, worker, options['lease'])
+    heartbeat.start()
+    # Host windows and pauses are shared with the other workers through the queue DB
+    dl = EgyDeadDL(scheduler=Scheduler(limiter_factory=functools.partial(SharedHostLimiter, queue, worker)))
+
+    with sync_playwright() as p:
+        browser = None
+        try:
+            while True:
+                job = queue.lease_next(worker)
+                if job is None:
+                    if not queue.unfinished():
+                        break
+                    time.sleep(0.5)  # Others may still add episodes or drop leases
+                    continue
+
+                heartbeat.job_id = job['id']
+                try:
+                    if job['kind'] == 'series':
+                        resp = dl.scheduler.request(dl.session.get, job['url'], headers=dl.headers)
+                        resp.raise_for_status()
+                        # Series pages may show some episodes next to their season links; queue
+                        # both, the UNIQUE url constraint drops anything already queued.
+                        episodes = main.find_episode_links(resp.text)
+                        seasons = dl.find_season_links(resp.text)
+                        added = 0
+                        for idx, ep_url in enumerate(episodes):
+                            ep_num = main.get_episode_number(ep_url) or idx + 1
+                            added += queue.add('episode', ep_url, f"{job['name']}_Ep{ep_num}")
+                        for season_url in seasons:
+                            added += queue.add('series', season_url, name_from_url(season_url))
+                        result = {'episodes': len(episodes), 'seasons': len(seasons), 'added': added}
+                        if episodes or seasons:
+                            queue.complete(job['id'], worker, result)
+                        else:
+                            queue.fail(job['id'], worker, "No episodes or seasons found", result)
+                    else:
+                        if browser is None:
+                            browser = p.chromium.launch(headless=True)
+                        folder = os.path.join(options['output'], item_folder(job))
+                        if options['action'] == 'download':
+                            os.makedirs(folder, exist_ok=True)
+                        result = main.process_download_item(
+                            dl, job['url'], job['name'], folder, options['action'],
+                            download_options=options['download_options'], browser=browser,
+                            interactive=False, quality_preference=options['quality'],
+                        )
+                        if result['status'] == 'failed':
+                            queue.fail(job['id'], worker, "Could not resolve or download", result)
+                        else:
+                            queue.complete(job['id'], worker, result)
+                except Exception as e:
+                    print(f"Error processing {job['url']}: {e}")
+                    queue.fail(job['id'], worker, str(e))
+                    if isinstance(e, PlaywrightError) and browser is not None:
+                        browser = close_browser(browser)
+                finally:
+                    heartbeat.job_id = None
+                # resolve_multi_download swallows its own Playwright errors, so check the browser too
+                if browser is not None and not browser.is_connected():
+                    print("Browser disconnected; relaunching for the next item.")
+                    browser = close_browser(browser)
+        finally:
+            heartbeat.stopped.set()
+            if browser is not None:
+                close_browser(browser)
+            queue.close()
+
+
+def run(job_path, queue_path, workers, options, fresh=False, poll=1.0):
+    """Runs the whole batch and returns the manifest dict."""
+    if fresh:
+        # Drop the WAL files too, or SQLite would replay a crashed run into the new queue
+        for path in (queue_path, queue_path + '-wal', queue_path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    queue = JobQueue(queue_path, lease=options['lease'], max_attempts=options['max_attempts'])
+    queue.clear_host_slots()
+    added = sum(queue.add(*job) for job in load_jobs(job_path))
+    print(f"Queued {added} new job(s); {queue.unfinished()} unfinished in {queue_path}.")
+
+    started = time.time()
+    spawned = 0
+    processes = {}
+
+    def spawn():
+        nonlocal spawned
+        spawned += 1
+        worker = f"worker-{spawned}"
+        process = multiprocessing.Process(target=worker_main, args=(worker, queue_path, options), name=worker)
+        process.start()
+        processes[worker] = process
+
+    for _ in range(workers):
+        spawn()
+
+    last_report = None
+    while processes:
+        time.sleep(poll)
+        for worker, process in list(processes.items()):
+            if process.is_alive():
+                continue
+            del processes[worker]
+            released = queue.release_worker(worker)
+            if process.exitcode != 0:
+                print(f"{worker} exited with code {process.exitcode}; {released} item(s) returned to the queue.")
+                if queue.unfinished() and spawned < workers * options['max_attempts']:
+                    spawn()
+
+        counts = queue.counts()
+        report = ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+        if report != last_report:
+            print(f"[{time.time() - started:.0f}s] {report}")
+            last_report = report
+
+    items = queue.rows()
+    queue.close()
+    finished = time.time()
+    leaf_items = [item for item in items if item['kind'] != 'series']
+    return {
+        'started': started,
+        'finished': finished,
+        'seconds': finished - started,
+        'workers': workers,
+        'action': options['action'],
+        'summary': {
+            'items': len(leaf_items),
+            'done': sum(1 for item in leaf_items if item['status'] == 'done'),
+            'failed': sum(1 for item in leaf_items if item['status'] == 'failed'),
+            'items_per_min': len(leaf_items) * 60 / max(finished - started, 1e-9),
+        },
+        'items': items,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="EgyDead multi-process batch runner")
+    parser.add_argument("jobs", help="Job file: page URLs or JSON lines")
+    parser.add_argument("--workers", type=main.positive_int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--action", choices=["download", "link"], default="download", help="Action to perform")
+    parser.add_argument("--quality", default="Full HD", help="Preferred quality name (falls back to the best found)")
+    parser.add_argument("--output", default=os.path.join("downloaded", "batch"), help="Download folder")
+    parser.add_argument("--queue", default="batch_queue.db", help="SQLite queue file (reused to resume a run)")
+    parser.add_argument("--fresh", action="store_true", help="Discard any existing queue file first")
+    parser.add_argument("--manifest", default="batch_manifest.json", help="Where to write the results")
+    parser.add_argument("--log-dir", default="batch_logs", help="Per-worker log folder")
+    parser.add_argument("--lease", type=float, default=120.0, help="Lease length in seconds")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts per item before giving up")
+    parser.add_argument("--buffer-size", type=main.positive_int, default=main.DOWNLOAD_BUFFER_SIZE // (1024 * 1024),
+                        help="Download buffer size in MB")
+    parser.add_argument("--fsync", choices=main.FSYNC_POLICIES, default="none", help="When to fsync downloaded files")
+    args = parser.parse_args()
+
+    options = {
+        'action': args.action,
+        'quality': args.quality,
+        'output': args.output,
+        'log_dir': args.log_dir,
+        'lease': args.lease,
+        'max_attempts': args.max_attempts,
+        'download_options': {'buffer_size': args.buffer_size * 1024 * 1024, 'fsync': args.fsync},
+    }
+    manifest = run(args.jobs, args.queue, args.workers, options, fresh=args.fresh)
+
+    with open(args.manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    summary = manifest['summary']
+    print(f"\nDone: {summary['done']}/{summary['items']} item(s), {summary['failed']} failed, "
+          f"{summary['items_per_min']:.1f} items/min with {args.workers} worker(s).")
+    print(f"Manifest written to {args.manifest}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,712 @@
+"""
+Offline benchmark for EgyDeadDL and main.py.
+
+Starts a local stand-in for the site (search, series, season, episode and
+server-list pages), the multi-download / DoodStream host pages and a
+range-capable CDN with configurable latency and bandwidth, then drives
+search, crawl, resolve and download end to end. With --handoff the downloads
+are also pushed through a mock aria2 JSON-RPC server. Nothing here touches
+the live site.
+
+Usage: python benchmark.py [--series 2] [--episodes 10] [--json run.json] [--compare old.json]
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import itertools
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, quote
+
+from egydead_dl import EgyDeadDL
+from throttle import Scheduler
+from aria2_backend import Aria2Client, Aria2Backend
+import main
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+BLOCK = bytes(range(256)) * 256  # 64 KiB repeating pattern served by the CDN
+
+
+class Catalog:
+    """Deterministic fake catalog: series -> seasons -> episodes."""
+
+    def __init__(self, series=2, seasons=2, episodes=10, file_size=8 * 1024 * 1024):
+        self.series = series
+        self.seasons = seasons
+        self.episodes = episodes
+        self.file_size = file_size
+
+    def series_slugs(self):
+        return [f"bench-show-{i}" for i in range(1, self.series + 1)]
+
+    def season_slugs(self, series_slug):
+        return [f"{series_slug}-season-{j}" for j in range(1, self.seasons + 1)]
+
+    def episode_slugs(self, season_slug):
+        return [f"{season_slug}-episode-{k}" for k in range(1, self.episodes + 1)]
+
+
+class BenchServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, catalog, latency=0.0, bandwidth=0, capacity=0, retry_after=None, **options):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.catalog = catalog
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.options = options
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.inflight = 0
+        self.throttled = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, nbytes=0):
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += nbytes
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_html(self, body, status=200):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(len(data))
+
+    def redirect(self, location):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        self.server.count()
+
+    def handle_one_request(self):
+        with self.server.lock:
+            self.server.inflight += 1
+        try:
+            super().handle_one_request()
+        finally:
+            with self.server.lock:
+                self.server.inflight -= 1
+
+    def admit(self):
+        """Applies latency, then answers 429 if more requests are in flight than the server's capacity."""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        capacity = self.server.capacity
+        if not capacity or self.server.inflight <= capacity:
+            return True
+        with self.server.lock:
+            self.server.throttled += 1
+        self.send_response(429)
+        if self.server.retry_after is not None:
+            self.send_header('Retry-After', str(self.server.retry_after))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        self.server.count()
+        return False
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length).decode('utf-8') if length else ''
+
+
+class SiteHandler(_Handler):
+    """Stand-in for the egydead site."""
+
+    def do_GET(self):
+        if not self.admit():
+            return
+        parsed = urlparse(self.path)
+        catalog = self.server.catalog
+        base = self.server.url
+        parts = [p for p in parsed.path.split('/') if p]
+
+        if not parts and 's' in parse_qs(parsed.query):
+            items = ''.join(
+                f'<li class="movieItem"><a href="{base}/serie/{slug}/" title="{slug}">'
+                f'<h1 class="BottomTitle">{slug.replace("-", " ")}</h1></a></li>\n'
+                for slug in catalog.series_slugs()
+            )
+            return self.send_html(f'<ul class="posts">\n{items}</ul>')
+
+        if len(parts) == 2 and parts[0] == 'serie':
+            links = ''.join(
+                f'<a href="{base}/season/{slug}/">{slug}</a>\n'
+                for slug in catalog.season_slugs(parts[1])
+            )
+            return self.send_html(f'<div class="seasons">\n{links}</div>')
+
+        if len(parts) == 2 and parts[0] == 'season':
+            links = ''.join(
+                f'<a href="{base}/episode/{slug}/">{slug}</a>\n'
+                for slug in catalog.episode_slugs(parts[1])
+            )
+            return self.send_html(f'<div class="episodes">\n{links}</div>')
+
+        if len(parts) == 2 and parts[0] == 'episode':
+            return self.send_html('<form method="post"><input name="View" value="1"></form>')
+
+        self.send_html('Not Found', status=404)
+
+    def do_POST(self):
+        self.read_body()
+        if not self.admit():
+            return
+        parts = [p for p in urlparse(self.path).path.split('/') if p]
+        if len(parts) == 2 and parts[0] == 'episode':
+            host = self.server.options['host_url']
+            file_id = quote(parts[1])
+            servers = (
+                f'<li><span class="ser-name">تحميل متعدد</span> <em>1080p</em>'
+                f' <a href="{host}/multi/{file_id}">Download</a></li>\n'
+                f'<li><span class="ser-name">DoodStream</span> <em>720p</em>'
+                f' <a href="{host}/dood/e/{file_id}">Download</a></li>\n'
+            )
+            return self.send_html(f'<ul class="donwload-servers-list">\n{servers}</ul>')
+        self.send_html('Not Found', status=404)
+
+
+class HostHandler(_Handler):
+    """Stand-in for the multi-download and DoodStream host pages."""
+
+    def do_GET(self):
+        if not self.admit():
+            return
+        parts = [p for p in urlparse(self.path).path.split('/') if p]
+        cdn = self.server.options['cdn_url']
+        size_mb = self.server.catalog.file_size / (1024 * 1024)
+
+        if len(parts) == 2 and parts[0] == 'multi':
+            return self.redirect(f"/v/{parts[1]}")
+
+        if len(parts) == 2 and parts[0] == 'v':
+            return self.send_html(
+                f'<a href="/f/{parts[1]}_h">Full HD quality</a>\n'
+                f'<a href="/f/{parts[1]}_n">SD quality</a>\n'
+            )
+
+        if len(parts) == 2 and parts[0] == 'f':
+            final = f"{cdn}/cdn/file/{parts[1]}.mp4"
+            return self.send_html(
+                f'<a class="btn-primary" href="#" onclick="'
+                f"var a=document.createElement('a');a.href='{final}';a.textContent='file';"
+                f'document.body.appendChild(a);return false;">Download {size_mb:.1f} MB</a>'
+            )
+
+        if len(parts) == 3 and parts[:2] == ['dood', 'e']:
+            return self.send_html(f'<a href="/dood/download/{parts[2]}">Download</a>')
+
+        if len(parts) == 3 and parts[:2] == ['dood', 'download']:
+            if self.server.options.get('dood_form'):
+                return self.send_html(
+                    '<Form name="F1" method="POST">'
+                    '<input type="hidden" name="op" value="download_orig">'
+                    f'<input type="hidden" name="id" value="{parts[2]}">'
+                    '<input type="hidden" name="mode" value="o">'
+                    '<input type="hidden" name="hash" value="bench">'
+                    '</Form>'
+                )
+            return self.send_final(parts[2])
+
+        self.send_html('Not Found', status=404)
+
+    def do_POST(self):
+        self.read_body()
+        if not self.admit():
+            return
+        parts = [p for p in urlparse(self.path).path.split('/') if p]
+        if len(parts) == 3 and parts[:2] == ['dood', 'download']:
+            return self.send_final(parts[2])
+        self.send_html('Not Found', status=404)
+
+    def send_final(self, file_id):
+        cdn = self.server.options['cdn_url']
+        self.send_html(
+            f'<a class="btn" href="{cdn}/cdn/file/{file_id}.mp4?token=bench&expiry=0">Download file</a>'
+        )
+
+
+class CDNHandler(_Handler):
+    """Range-capable file server with per-connection bandwidth shaping."""
+
+    def do_HEAD(self):
+        self.serve_file(head=True)
+
+    def do_GET(self):
+        self.serve_file()
+
+    def serve_file(self, head=False):
+        if not self.admit():
+            return
+        if not urlparse(self.path).path.startswith('/cdn/file/'):
+            return self.send_html('Not Found', status=404)
+
+        size = self.server.catalog.file_size
+        start, end = 0, size - 1
+        status = 200
+        range_header = self.headers.get('Range')
+        if range_header:
+            byte_range = parse_range(range_header, size)
+            if byte_range is None:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                self.server.count()
+                return
+            start, end = byte_range
+            status = 206
+
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(length))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        if head:
+            self.server.count()
+            return
+
+        sent = 0
+        began = time.monotonic()
+        bandwidth = self.server.bandwidth
+        offset = start
+        try:
+            while sent < length:
+                pos = offset % len(BLOCK)
+                chunk = BLOCK[pos:pos + min(len(BLOCK) - pos, length - sent)]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                offset += len(chunk)
+                if bandwidth:
+                    ahead = sent / bandwidth - (time.monotonic() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.server.count(sent)
+
+
+class MockAria2Server(ThreadingHTTPServer):
+    """Local stand-in for aria2's JSON-RPC interface that really downloads each URI."""
+    daemon_threads = True
+
+    def __init__(self, secret=None):
+        super().__init__(('127.0.0.1', 0), MockAria2Handler)
+        self.secret = secret
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.gids = itertools.count(1)
+        self.requests = 0
+        self.throttled = 0
+        self.inflight = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/jsonrpc"
+
+    def add_uri(self, uris, options=None):
+        options = options or {}
+        gid = f"{next(self.gids):016x}"
+        headers = dict(h.split(': ', 1) for h in options.get('header', []))
+        job = {'status': 'waiting', 'totalLength': '0', 'completedLength': '0',
+               'downloadSpeed': '0', 'options': options, 'headers': headers}
+        with self.lock:
+            self.jobs[gid] = job
+        threading.Thread(target=self.fetch, args=(job, uris[0]), daemon=True).start()
+        return gid
+
+    def fetch(self, job, uri):
+        path = os.path.join(job['options'].get('dir', '.'), job['options'].get('out', 'download'))
+        job['status'] = 'active'
+        try:
+            with main.requests.get(uri, headers=job['headers'], stream=True, timeout=30) as r:
+                r.raise_for_status()
+                job['totalLength'] = r.headers.get('Content-Length', '0')
+                done = 0
+                with open(path, 'wb') as f:
+                    for chunk in r.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+                        done += len(chunk)
+                        job['completedLength'] = str(done)
+            job['status'] = 'complete'
+        except Exception as e:
+            job['status'] = 'error'
+            job['errorMessage'] = str(e)
+
+    def tell_status(self, gid, keys=None):
+        job = self.jobs.get(gid)
+        if job is None:
+            raise KeyError(f"GID {gid} is not found")
+        status = {'gid': gid, **{k: v for k, v in job.items() if isinstance(v, str)}}
+        return {k: v for k, v in status.items() if k in keys} if keys else status
+
+    def dispatch(self, method, params):
+        if self.secret is not None and not method.startswith('system.'):
+            if not params or params[0] != f"token:{self.secret}":
+                raise PermissionError("Unauthorized")
+            params = params[1:]
+        if method == 'aria2.getVersion':
+            return {'version': 'mock', 'enabledFeatures': []}
+        if method == 'aria2.addUri':
+            return self.add_uri(*params)
+        if method == 'aria2.tellStatus':
+            return self.tell_status(*params)
+        raise KeyError(f"Method not found: {method}")
+
+
+class MockAria2Handler(_Handler):
+    def do_POST(self):
+        request = json.loads(self.read_body())
+        with self.server.lock:
+            self.server.requests += 1
+        try:
+            if request['method'] == 'system.multicall':
+                result = []
+                for call in request['params'][0]:
+                    try:
+                        result.append([self.server.dispatch(call['methodName'], call['params'])])
+                    except Exception as e:
+                        result.append({'code': 1, 'message': str(e)})
+                body = {'jsonrpc': '2.0', 'id': request['id'], 'result': result}
+            else:
+                body = {'jsonrpc': '2.0', 'id': request['id'],
+                        'result': self.server.dispatch(request['method'], request['params'])}
+        except Exception as e:
+            body = {'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': 1, 'message': str(e)}}
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json-rpc')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def parse_range(header, size):
+    """Parses a single 'bytes=a-b' range. Returns (start, end) or None if unsatisfiable."""
+    if not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[6:].strip().partition('-')
+    try:
+        if first == '':
+            suffix = int(last)
+            if suffix <= 0:
+                return None
+            return max(size - suffix, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def verify_file(path, size):
+    """Checks a downloaded file against the CDN pattern."""
+    if os.path.getsize(path) != size:
+        return False
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(len(BLOCK))
+            if not chunk:
+                return True
+            if chunk != BLOCK[:len(chunk)]:
+                return False
+
+
+def legacy_download(url, folder, filename):
+    """The original 8 KiB iter_content loop, kept as the 'before' for --legacy."""
+    with main.requests.get(url, stream=True, timeout=30) as r:
+        r.raise_for_status()
+        with open(os.path.join(folder, filename), 'wb') as f:
+            for chunk in r.iter_content(chunk_size=8192):
+                if chunk:
+                    f.write(chunk)
+
+
+def start_servers(catalog, site_latency, cdn_latency, bandwidth, dood_form, capacity=0, retry_after=None):
+    cdn = BenchServer(CDNHandler, catalog, latency=cdn_latency, bandwidth=bandwidth)
+    host = BenchServer(HostHandler, catalog, latency=site_latency, capacity=capacity,
+                       retry_after=retry_after, cdn_url=cdn.url, dood_form=dood_form)
+    site = BenchServer(SiteHandler, catalog, latency=site_latency, capacity=capacity,
+                       retry_after=retry_after, host_url=host.url)
+    for server in (site, host, cdn):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return site, host, cdn
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Stage:
+    """Times a benchmark stage: wall clock, CPU and server-side request/429 counts."""
+
+    def __init__(self, name, servers, cpu_clock=time.process_time):
+        self.name = name
+        # The fake servers share this process; sequential stages pass time.thread_time
+        # so their CPU figure covers only the client thread.
+        self.cpu_clock = cpu_clock
+        self.servers = servers
+        self.result = {}
+
+    def __enter__(self):
+        self.requests = sum(s.requests for s in self.servers)
+        self.throttled = sum(s.throttled for s in self.servers)
+        self.wall = time.perf_counter()
+        self.cpu = self.cpu_clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.result['seconds'] = time.perf_counter() - self.wall
+        self.result['cpu_seconds'] = self.cpu_clock() - self.cpu
+        self.result['requests'] = sum(s.requests for s in self.servers) - self.requests
+        self.result['throttled'] = sum(s.throttled for s in self.servers) - self.throttled
+        self.result['peak_rss_mb'] = peak_rss_mb()
+        return False
+
+
+def quiet(verbose):
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+
+def run(args):
+    catalog = Catalog(args.series, args.seasons, args.episodes, int(args.file_size * 1024 * 1024))
+    site, host, cdn = start_servers(
+        catalog, args.site_latency / 1000.0, args.cdn_latency / 1000.0,
+        int(args.bandwidth * 1024 * 1024), args.dood_form,
+        capacity=args.site_capacity, retry_after=args.retry_after,
+    )
+    dl = EgyDeadDL(base_url=site.url, scheduler=Scheduler(maximum=max(args.workers, 1)))
+    results = {}
+
+    # 1. Search
+    found = []
+    with Stage('search', [site]) as stage, quiet(args.verbose):
+        for _ in range(args.searches):
+            found = dl.search('bench show')
+    stage.result['pages_per_sec'] = stage.result['requests'] / stage.result['seconds']
+    results['search'] = stage.result
+
+    # 2. Crawl: series -> seasons -> episodes -> server lists
+    with Stage('crawl', [site]) as stage, quiet(args.verbose):
+        season_urls = [s for series in found for s in dl.get_season_links(series['url'])]
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            episode_urls = [e for links in pool.map(dl.get_episode_links, season_urls) for e in links]
+            episodes = list(zip(episode_urls, pool.map(dl.get_download_links, episode_urls)))
+    stage.result['items'] = len(episodes)
+    stage.result['window'] = dl.scheduler.limiter(site.url).limit
+    stage.result['pages_per_sec'] = stage.result['requests'] / stage.result['seconds']
+    stage.result['items_per_min'] = len(episodes) * 60 / stage.result['seconds']
+    results['crawl'] = stage.result
+
+    # 3. Resolve DoodStream links (requests-based resolver)
+    resolved = []
+    with Stage('resolve', [host]) as stage, quiet(args.verbose):
+        for episode_url, links in episodes[:args.resolve]:
+            for link in links:
+                if 'dood' in link['url']:
+                    final_url = dl.resolve_doodstream(link['url'])
+                    if final_url:
+                        resolved.append(final_url)
+    stage.result['items'] = len(resolved)
+    stage.result['items_per_min'] = len(resolved) * 60 / stage.result['seconds']
+    results['resolve'] = stage.result
+
+    # 3b. Resolve multi-download links through Playwright (optional, needs a browser)
+    if args.browser:
+        count = 0
+        with Stage('resolve_multi', [host]) as stage, quiet(args.verbose):
+            for episode_url, links in episodes[:args.browser]:
+                for link in links:
+                    if 'multi' in link['url']:
+                        final_url, _ = main.resolve_multi_download(link['url'], quality_preference='Full HD')
+                        if final_url:
+                            count += 1
+        stage.result['items'] = count
+        stage.result['items_per_min'] = count * 60 / stage.result['seconds']
+        results['resolve_multi'] = stage.result
+
+    # 4. Download through main.download_file (and optionally the old 8 KiB loop)
+    writers = [('download', lambda url, folder, name: main.download_file(
+        url, folder, name, buffer_size=int(args.buffer_size * 1024 * 1024),
+        fsync=args.fsync, direct=args.direct))]
+    if args.legacy:
+        writers.insert(0, ('download_8k', legacy_download))
+
+    for name, writer in writers:
+        folder = tempfile.mkdtemp(prefix='egydead-bench-')
+        try:
+            with Stage(name, [cdn], cpu_clock=time.thread_time) as stage, quiet(args.verbose):
+                for i, url in enumerate(resolved[:args.downloads]):
+                    writer(url, folder, f"bench_{i}.mp4")
+            paths = [os.path.join(folder, f) for f in os.listdir(folder)]
+            total = sum(os.path.getsize(path) for path in paths)
+            if not all(verify_file(path, catalog.file_size) for path in paths):
+                print(f"WARNING: {name} produced corrupt or truncated files")
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+        stage.result['bytes'] = total
+        stage.result['mb_per_sec'] = total / (1024 * 1024) / stage.result['seconds']
+        stage.result['cpu_seconds_per_gb'] = (
+            stage.result['cpu_seconds'] / (total / 1024 ** 3) if total else None
+        )
+        results[name] = stage.result
+
+    # 5. Hand the same URLs to an aria2-compatible JSON-RPC server
+    if args.handoff:
+        rpc = MockAria2Server(secret='bench')
+        threading.Thread(target=rpc.serve_forever, daemon=True).start()
+        backend = Aria2Backend(Aria2Client(rpc.url, secret='bench'), headers=main.DOWNLOAD_HEADERS,
+                               split=args.split, batch_size=args.batch_size)
+        folder = tempfile.mkdtemp(prefix='egydead-bench-')
+        try:
+            with Stage('handoff', [cdn]) as stage, quiet(args.verbose):
+                for i, url in enumerate(resolved[:args.downloads]):
+                    backend.add(url, folder, f"bench_{i}.mp4")
+                jobs = backend.wait(interval=0.05)
+            ok = all(job['status'] == 'complete' and verify_file(job['path'], catalog.file_size) for job in jobs)
+            ok = ok and all(job['headers'].get('Referer') == main.DOWNLOAD_HEADERS['Referer']
+                            for job in rpc.jobs.values())
+            if not ok:
+                print("WARNING: handoff produced failed, corrupt or header-less downloads")
+            total = sum(job['completed'] for job in jobs)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+            rpc.shutdown()
+            rpc.server_close()
+        stage.result['items'] = len(jobs)
+        stage.result['rpc_calls'] = rpc.requests
+        stage.result['bytes'] = total
+        stage.result['mb_per_sec'] = total / (1024 * 1024) / stage.result['seconds']
+        results['handoff'] = stage.result
+
+    for server in (site, host, cdn):
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'config': {k: v for k, v in vars(args).items() if k not in ('json', 'compare', 'verbose')},
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'stages': results,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+METRICS = [
+    ('pages_per_sec', 'pages/s'),
+    ('items_per_min', 'items/min'),
+    ('mb_per_sec', 'MB/s'),
+    ('cpu_seconds_per_gb', 'CPU s/GB'),
+    ('rpc_calls', 'RPC calls'),
+    ('throttled', '429s'),
+    ('window', 'AIMD window'),
+    ('seconds', 's'),
+    ('peak_rss_mb', 'MB peak RSS'),
+]
+
+
+def report(report_data, baseline=None):
+    print(f"\n{'Stage':<14}{'Metric':<14}{'Value':>12}{'Baseline':>12}{'Change':>10}")
+    for name, stage in report_data['stages'].items():
+        old_stage = (baseline or {}).get('stages', {}).get(name, {})
+        for key, label in METRICS:
+            value = stage.get(key)
+            if value is None:
+                continue
+            old = old_stage.get(key)
+            old_text = f"{old:>12.2f}" if old is not None else f"{'-':>12}"
+            change = f"{(value - old) / old * 100:>+9.1f}%" if old else f"{'-':>10}"
+            print(f"{name:<14}{label:<14}{value:>12.2f}{old_text}{change}")
+    if report_data['peak_rss_mb'] is not None:
+        print(f"\nPeak RSS: {report_data['peak_rss_mb']:.1f} MB")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline EgyDead benchmark")
+    parser.add_argument("--series", type=int, default=2, help="Series in the fake catalog")
+    parser.add_argument("--seasons", type=int, default=2, help="Seasons per series")
+    parser.add_argument("--episodes", type=int, default=10, help="Episodes per season")
+    parser.add_argument("--searches", type=int, default=20, help="Search requests to issue")
+    parser.add_argument("--resolve", type=int, default=10, help="Episodes to resolve via DoodStream")
+    parser.add_argument("--browser", type=int, default=0,
+                        help="Episodes to resolve via Playwright multi-download (needs Chromium)")
+    parser.add_argument("--workers", type=main.positive_int, default=1, help="Concurrent crawl workers")
+    parser.add_argument("--site-capacity", type=int, default=0,
+                        help="Site/host answer 429 above this many in-flight requests (0 = unlimited)")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with simulated 429s")
+    parser.add_argument("--downloads", type=int, default=4, help="Files to download")
+    parser.add_argument("--file-size", type=float, default=64, help="CDN file size in MB")
+    parser.add_argument("--site-latency", type=float, default=0, help="Site/host latency in ms")
+    parser.add_argument("--cdn-latency", type=float, default=0, help="CDN time-to-first-byte in ms")
+    parser.add_argument("--bandwidth", type=float, default=0,
+                        help="CDN bandwidth per connection in MB/s (0 = unlimited)")
+    parser.add_argument("--buffer-size", type=float, default=main.DOWNLOAD_BUFFER_SIZE / (1024 * 1024),
+                        help="download_file buffer size in MB")
+    parser.add_argument("--fsync", choices=main.FSYNC_POLICIES, default="none", help="download_file fsync policy")
+    parser.add_argument("--direct", action="store_true", help="Write downloads with O_DIRECT")
+    parser.add_argument("--legacy", action="store_true",
+                        help="Also run the original 8 KiB iter_content writer for comparison")
+    parser.add_argument("--handoff", action="store_true",
+                        help="Also hand downloads to a mock aria2 JSON-RPC server")
+    parser.add_argument("--split", type=main.positive_int, default=8, help="aria2 split count for --handoff")
+    parser.add_argument("--batch-size", type=main.positive_int, default=20, help="aria2 submission batch size for --handoff")
+    parser.add_argument("--dood-form", action="store_true",
+                        help="Serve the DoodStream F1 intermediate form")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file from a previous run")
+    parser.add_argument("--verbose", action="store_true", help="Show downloader output")
+    args = parser.parse_args()
+    if args.buffer_size <= 0:
+        parser.error("--buffer-size must be positive")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    report_data = run(args)
+    report(report_data, baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report_data, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -3,16 +3,27 @@ import re
 import sys
 import time
 from urllib.parse import quote, unquote, urlparse
+from requests.adapters import HTTPAdapter
+from throttle import Scheduler, DEFAULT_MAX_WINDOW
 
 # ... (imports)
 
 class EgyDeadDL:
-    def __init__(self):
-        self.base_url = "https://egydead.skin"
+    def __init__(self, base_url="https://egydead.skin", scheduler=None):
+        self.base_url = base_url.rstrip('/')
         self.search_url = f"{self.base_url}/?s="
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        # Shared by every fetch so each host gets one adaptive concurrency window
+        self.scheduler = scheduler or Scheduler()
+        # Keep-alive pool sized for the largest window the scheduler may open
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.scheduler.limiter_options.get('maximum', DEFAULT_MAX_WINDOW))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Pause before posting the DoodStream F1 form, outside any host slot
+        self.form_delay = 2
 
     def search(self, query):
         print(f"Searching for: {query}")
@@ -20,7 +31,7 @@ class EgyDeadDL:
         url = f"{self.search_url}{encoded_query}"
         
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self.scheduler.request(self.session.get, url, headers=self.headers)
             response.raise_for_status()
         except requests.RequestException as e:
             print(f"Error during search: {e}")
@@ -52,22 +63,38 @@ class EgyDeadDL:
             # Assume it's a movie or episode (downloadable)
             self.handle_download_page(url)
 
-    def handle_series(self, url):
-        print("Detected Series. Fetching Seasons...")
+    def _unique_links(self, url, pattern):
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self.scheduler.request(self.session.get, url, headers=self.headers)
             response.raise_for_status()
         except requests.RequestException as e:
             print(f"Error: {e}")
-            return
+            return []
+
+        return self._find_unique(response.text, pattern)
 
-        links = re.findall(r'href="([^"]*/season/[^"]*)"', response.text)
+    def _find_unique(self, html, pattern):
+        links = re.findall(pattern, html)
         seen = set()
         unique_links = []
         for l in links:
             if l not in seen:
                 seen.add(l)
                 unique_links.append(l)
+        return unique_links
+
+    def find_season_links(self, html):
+        return self._find_unique(html, r'href="([^"]*/season/[^"]*)"')
+
+    def get_season_links(self, url):
+        return self._unique_links(url, r'href="([^"]*/season/[^"]*)"')
+
+    def get_episode_links(self, url):
+        return self._unique_links(url, r'href="([^"]*/episode/[^"]*)"')
+
+    def handle_series(self, url):
+        print("Detected Series. Fetching Seasons...")
+        unique_links = self.get_season_links(url)
         
         if not unique_links:
             print("No seasons found.")
@@ -80,20 +107,7 @@ class EgyDeadDL:
 
     def handle_season(self, url, fetch_all=False):
         print("Detected Season. Fetching Episodes...")
-        try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-        except requests.RequestException as e:
-            print(f"Error: {e}")
-            return
-
-        links = re.findall(r'href="([^"]*/episode/[^"]*)"', response.text)
-        seen = set()
-        unique_links = []
-        for l in links:
-            if l not in seen:
-                seen.add(l)
-                unique_links.append(l)
+        unique_links = self.get_episode_links(url)
         
         if not unique_links:
             print("No episodes found.")
@@ -137,7 +151,7 @@ class EgyDeadDL:
             session.headers.update(self.headers)
             
             # Step 1: Get the embed/landing page
-            response = session.get(url)
+            response = self.scheduler.request(session.get, url)
             response.raise_for_status()
             
             # Step 2: Find the "High quality" or "Download" link (looking for /download/ path)
@@ -155,7 +169,7 @@ class EgyDeadDL:
 
             # Step 3: Get the final download page with Referer
             session.headers.update({'Referer': url})
-            response = session.get(download_page_url)
+            response = self.scheduler.request(session.get, download_page_url)
             response.raise_for_status()
             
             # Step 3.5: Check for form submission (Security error / intermediate page)
@@ -166,7 +180,7 @@ class EgyDeadDL:
                     mode = re.search(r'name="mode" value="(.*?)"', response.text).group(1)
                     hash_val = re.search(r'name="hash" value="(.*?)"', response.text).group(1)
                     
-                    time.sleep(2) # Wait a bit to mimic human
+                    time.sleep(self.form_delay) # Wait a bit to mimic human
                     
                     post_data = {
                         'op': op,
@@ -176,7 +190,7 @@ class EgyDeadDL:
                     }
                     
                     session.headers.update({'Referer': download_page_url})
-                    response = session.post(download_page_url, data=post_data)
+                    response = self.scheduler.request(session.post, download_page_url, data=post_data)
                     response.raise_for_status()
                 except AttributeError:
                     pass
@@ -190,14 +204,13 @@ class EgyDeadDL:
             if token_match:
                 return token_match.group(1)
 
-        except Exception as e:
-            # print(f"Error resolving DoodStream: {e}")
-            pass
+        except requests.RequestException as e:
+            print(f"Error resolving DoodStream: {e}")
         return None
 
     def get_download_links(self, movie_url):
         try:
-            response = requests.post(movie_url, data={'View': '1'}, headers=self.headers)
+            response = self.scheduler.request(self.session.post, movie_url, data={'View': '1'}, headers=self.headers)
             response.raise_for_status()
         except requests.RequestException as e:
             print(f"Error fetching movie page: {e}")
@@ -4,221 +4,347 @@ import time
 import re
 import requests
 import argparse
+import http.client
+import mmap
 from urllib.parse import unquote
 from egydead_dl import EgyDeadDL
+from aria2_backend import Aria2Client, Aria2Backend, Aria2Error
 from playwright.sync_api import sync_playwright
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 
 # Force UTF-8 output for Windows console
 if sys.platform == "win32":
     sys.stdout.reconfigure(encoding='utf-8')
 
-def resolve_multi_download(url, quality_preference=None):
+def resolve_multi_download(url, quality_preference=None, browser=None, interactive=True):
     """
     Resolves the 'Multi Download' link to get the final direct link.
+    browser: an already launched Playwright browser to reuse (a new one is launched and closed otherwise).
+    interactive: when False, never prompt; fall back to the best quality found.
     Returns: (final_url, selected_quality_name)
     """
+    if browser is None:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            try:
+                return resolve_multi_download(url, quality_preference, browser, interactive)
+            finally:
+                browser.close()
+
     print(f"Resolving Multi Download: {url}")
     
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
-        page = context.new_page()
+    context = browser.new_context()
+    page = context.new_page()
+    
+    try:
+        # 1. Navigate to the initial redirector
+        print("Navigating to initial URL...")
+        page.goto(url, timeout=60000)
+        page.wait_for_load_state('networkidle')
+        print(f"Redirected to: {page.url}")
         
-        try:
-            # 1. Navigate to the initial redirector
-            print("Navigating to initial URL...")
-            page.goto(url, timeout=60000)
-            page.wait_for_load_state('networkidle')
-            print(f"Redirected to: {page.url}")
-            
-            # 2. Find quality options
-            potential_qualities = [
-                {"name": "Full HD (1080p)", "selector": "text=Full HD quality"},
-                {"name": "HD (720p)", "selector": "text=HD quality"},
-                {"name": "SD (480p/360p)", "selector": "text=SD quality"},
-                {"name": "Low Quality", "selector": "text=Low quality"},
-            ]
+        # 2. Find quality options
+        potential_qualities = [
+            {"name": "Full HD (1080p)", "selector": "text=Full HD quality"},
+            {"name": "HD (720p)", "selector": "text=HD quality"},
+            {"name": "SD (480p/360p)", "selector": "text=SD quality"},
+            {"name": "Low Quality", "selector": "text=Low quality"},
+        ]
+        
+        found_qualities = []
+        for q in potential_qualities:
+            if page.locator(q["selector"]).count() > 0:
+                href = page.locator(q["selector"]).get_attribute("href")
+                if href:
+                    if not href.startswith("http"):
+                        base = "/".join(page.url.split("/")[:3])
+                        href = base + href if href.startswith("/") else base + "/" + href
+                    found_qualities.append({"name": q["name"], "url": href})
+
+        if not found_qualities:
+            print("Could not detect quality options automatically.")
             
-            found_qualities = []
-            for q in potential_qualities:
-                if page.locator(q["selector"]).count() > 0:
-                    href = page.locator(q["selector"]).get_attribute("href")
-                    if href:
-                        if not href.startswith("http"):
-                            base = "/".join(page.url.split("/")[:3])
-                            href = base + href if href.startswith("/") else base + "/" + href
-                        found_qualities.append({"name": q["name"], "url": href})
+            # Check for generic download button
+            download_btn = page.locator("text=Download File")
+            if download_btn.count() == 0:
+                download_btn = page.locator("text=Create Download Link")
+            if download_btn.count() == 0:
+                 download_btn = page.locator("button:has-text('Download')")
 
+            if download_btn.count() > 0:
+                print(f"Found download button: {download_btn.first.inner_text()}. Clicking...")
+                try:
+                    download_btn.first.click(timeout=5000)
+                    page.wait_for_load_state('networkidle')
+                except:
+                    print("Click failed or timed out.")
+                
+                for q in potential_qualities:
+                    if page.locator(q["selector"]).count() > 0:
+                        href = page.locator(q["selector"]).get_attribute("href")
+                        if href:
+                            if not href.startswith("http"):
+                                base = "/".join(page.url.split("/")[:3])
+                                href = base + href if href.startswith("/") else base + "/" + href
+                            found_qualities.append({"name": q["name"], "url": href})
+            else:
+                print("No initial download button found.")
+                page.screenshot(path="debug_no_button.png")
+            
             if not found_qualities:
-                print("Could not detect quality options automatically.")
+                 # Fallback: Construct URLs
+                 url_parts = page.url.split('/')
+                 file_id = url_parts[-1]
+                 base_domain = "/".join(url_parts[:3])
+                 
+                 manual_qualities = [
+                     {"name": "Full HD (Constructed)", "url": f"{base_domain}/f/{file_id}_h"},
+                     {"name": "HD (Constructed)", "url": f"{base_domain}/f/{file_id}_n"},
+                     {"name": "Original/Default (Constructed)", "url": f"{base_domain}/f/{file_id}"}
+                 ]
+                 print("Attempting to use constructed quality URLs...")
+                 found_qualities.extend(manual_qualities)
+
+        # 3. Fetch sizes
+        print("Fetching file sizes for quality options...")
+        btn_selector = ".g-recaptcha, a.btn-primary:has-text('Download'), button:has-text('Download'), a:has-text('Download')"
+        
+        for q in found_qualities:
+            try:
+                print(f"Checking {q['name']}...")
+                page.goto(q['url'], timeout=30000)
+                page.wait_for_load_state('networkidle')
                 
-                # Check for generic download button
-                download_btn = page.locator("text=Download File")
-                if download_btn.count() == 0:
-                    download_btn = page.locator("text=Create Download Link")
-                if download_btn.count() == 0:
-                     download_btn = page.locator("button:has-text('Download')")
-
-                if download_btn.count() > 0:
-                    print(f"Found download button: {download_btn.first.inner_text()}. Clicking...")
-                    try:
-                        download_btn.first.click(timeout=5000)
-                        page.wait_for_load_state('networkidle')
-                    except:
-                        print("Click failed or timed out.")
-                    
-                    for q in potential_qualities:
-                        if page.locator(q["selector"]).count() > 0:
-                            href = page.locator(q["selector"]).get_attribute("href")
-                            if href:
-                                if not href.startswith("http"):
-                                    base = "/".join(page.url.split("/")[:3])
-                                    href = base + href if href.startswith("/") else base + "/" + href
-                                found_qualities.append({"name": q["name"], "url": href})
+                btn = page.locator(btn_selector).first
+                if btn.count() > 0:
+                    text = btn.inner_text()
+                    size_match = re.search(r'(\d+(?:\.\d+)?\s*(?:GB|MB|KB))', text, re.IGNORECASE)
+                    q['size'] = size_match.group(1) if size_match else "Unknown Size"
+                    q['has_button'] = True
                 else:
-                    print("No initial download button found.")
-                    page.screenshot(path="debug_no_button.png")
-                
-                if not found_qualities:
-                     # Fallback: Construct URLs
-                     url_parts = page.url.split('/')
-                     file_id = url_parts[-1]
-                     base_domain = "/".join(url_parts[:3])
-                     
-                     manual_qualities = [
-                         {"name": "Full HD (Constructed)", "url": f"{base_domain}/f/{file_id}_h"},
-                         {"name": "HD (Constructed)", "url": f"{base_domain}/f/{file_id}_n"},
-                         {"name": "Original/Default (Constructed)", "url": f"{base_domain}/f/{file_id}"}
-                     ]
-                     print("Attempting to use constructed quality URLs...")
-                     found_qualities.extend(manual_qualities)
-
-            # 3. Fetch sizes
-            print("Fetching file sizes for quality options...")
-            btn_selector = ".g-recaptcha, a.btn-primary:has-text('Download'), button:has-text('Download'), a:has-text('Download')"
-            
-            for q in found_qualities:
-                try:
-                    print(f"Checking {q['name']}...")
-                    page.goto(q['url'], timeout=30000)
-                    page.wait_for_load_state('networkidle')
-                    
-                    btn = page.locator(btn_selector).first
-                    if btn.count() > 0:
-                        text = btn.inner_text()
-                        size_match = re.search(r'(\d+(?:\.\d+)?\s*(?:GB|MB|KB))', text, re.IGNORECASE)
-                        q['size'] = size_match.group(1) if size_match else "Unknown Size"
-                        q['has_button'] = True
-                    else:
-                        q['size'] = "Button not found"
-                        q['has_button'] = False
-                except Exception as e:
-                    print(f"Error checking {q['name']}: {e}")
-                    q['size'] = "Error"
+                    q['size'] = "Button not found"
                     q['has_button'] = False
+            except Exception as e:
+                print(f"Error checking {q['name']}: {e}")
+                q['size'] = "Error"
+                q['has_button'] = False
+
+        print("\nAvailable Qualities:")
+        valid_qualities = [q for q in found_qualities if q.get('has_button')]
+        
+        if not valid_qualities:
+            print("No valid download buttons found on quality pages.")
+            # Fallback: Check original page
+            print("Checking original page for download button...")
+            try:
+                if 'url_parts' in locals():
+                     original_url = f"{base_domain}/{file_id}"
+                     print(f"Navigating back to: {original_url}")
+                     page.goto(original_url, timeout=30000)
+                     page.wait_for_load_state('networkidle')
+                     
+                     btn = page.locator(btn_selector).first
+                     if btn.count() > 0:
+                         print("Found button on original page!")
+                         valid_qualities.append({
+                             "name": "Single Quality / Direct",
+                             "url": original_url,
+                             "size": "Unknown", 
+                             "has_button": True
+                         })
+                     else:
+                         page.screenshot(path="debug_fallback_fail.png")
+            except Exception as e:
+                print(f"Fallback failed: {e}")
+
+        if not valid_qualities:
+             return None, None
 
-            print("\nAvailable Qualities:")
-            valid_qualities = [q for q in found_qualities if q.get('has_button')]
+        # 4. Ask user for quality
+        selected_q = None
+        if len(valid_qualities) == 1:
+            selected_q = valid_qualities[0]
+        elif quality_preference:
+             for q in valid_qualities:
+                if quality_preference.lower() in q["name"].lower():
+                    selected_q = q
+                    break
+        
+        if not selected_q and not interactive:
+            selected_q = valid_qualities[0]
+
+        if not selected_q:
+            for i, q in enumerate(valid_qualities):
+                print(f"{i+1}. {q['name']} - {q.get('size', 'Unknown')}")
             
-            if not valid_qualities:
-                print("No valid download buttons found on quality pages.")
-                # Fallback: Check original page
-                print("Checking original page for download button...")
+            while True:
                 try:
-                    if 'url_parts' in locals():
-                         original_url = f"{base_domain}/{file_id}"
-                         print(f"Navigating back to: {original_url}")
-                         page.goto(original_url, timeout=30000)
-                         page.wait_for_load_state('networkidle')
-                         
-                         btn = page.locator(btn_selector).first
-                         if btn.count() > 0:
-                             print("Found button on original page!")
-                             valid_qualities.append({
-                                 "name": "Single Quality / Direct",
-                                 "url": original_url,
-                                 "size": "Unknown", 
-                                 "has_button": True
-                             })
-                         else:
-                             page.screenshot(path="debug_fallback_fail.png")
-                except Exception as e:
-                    print(f"Fallback failed: {e}")
-
-            if not valid_qualities:
-                 return None, None
-
-            # 4. Ask user for quality
-            selected_q = None
-            if len(valid_qualities) == 1:
-                selected_q = valid_qualities[0]
-            elif quality_preference:
-                 for q in valid_qualities:
-                    if quality_preference.lower() in q["name"].lower():
-                        selected_q = q
+                    choice = int(input("Select quality (number): ")) - 1
+                    if 0 <= choice < len(valid_qualities):
+                        selected_q = valid_qualities[choice]
                         break
-            
-            if not selected_q:
-                for i, q in enumerate(valid_qualities):
-                    print(f"{i+1}. {q['name']} - {q.get('size', 'Unknown')}")
-                
-                while True:
-                    try:
-                        choice = int(input("Select quality (number): ")) - 1
-                        if 0 <= choice < len(valid_qualities):
-                            selected_q = valid_qualities[choice]
-                            break
-                    except ValueError:
-                        pass
-                    print("Invalid selection.")
+                except ValueError:
+                    pass
+                print("Invalid selection.")
 
-            print(f"Selected: {selected_q['name']} ({selected_q.get('size', 'Unknown')})")
-            
-            # 5. Navigate and Click
-            if page.url != selected_q['url']:
-                page.goto(selected_q['url'])
-                page.wait_for_load_state('networkidle')
-            
-            dl_btn = page.locator(btn_selector).first
-            if dl_btn.count() > 0:
-                print("Found download trigger button. Clicking...")
-                dl_btn.click(force=True)
-                print("Waiting for final link...")
-                time.sleep(10)
-                
-                all_links = page.eval_on_selector_all("a", "elements => elements.map(e => e.href)")
-                for link in all_links:
-                    if ".mp4" in link and ("premilkyway" in link or "cdn" in link or len(link) > 100):
-                        return link, selected_q['name']
+        print(f"Selected: {selected_q['name']} ({selected_q.get('size', 'Unknown')})")
+        
+        # 5. Navigate and Click
+        if page.url != selected_q['url']:
+            page.goto(selected_q['url'])
+            page.wait_for_load_state('networkidle')
+        
+        dl_btn = page.locator(btn_selector).first
+        if dl_btn.count() > 0:
+            print("Found download trigger button. Clicking...")
+            dl_btn.click(force=True)
+            print("Waiting for final link...")
+            time.sleep(10)
             
-        except Exception as e:
-            print(f"Error in Playwright: {e}")
-        finally:
-            browser.close()
+            all_links = page.eval_on_selector_all("a", "elements => elements.map(e => e.href)")
+            for link in all_links:
+                if ".mp4" in link and ("premilkyway" in link or "cdn" in link or len(link) > 100):
+                    return link, selected_q['name']
+        
+    except Exception as e:
+        print(f"Error in Playwright: {e}")
+    finally:
+        context.close()
             
     return None, None
 
 
-def download_file(url, folder, filename):
+DOWNLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Referer': 'https://haxloppd.com/' # Generic referer might help
+}
+DOWNLOAD_BUFFER_SIZE = 4 * 1024 * 1024
+FSYNC_INTERVAL = 256 * 1024 * 1024
+FSYNC_POLICIES = ("none", "end", "periodic")
+
+
+def positive_int(value):
+    """argparse type for options that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def _preallocate(fd, size):
+    """Reserves disk space up front so the file is laid out contiguously."""
+    if size and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except OSError:
+            pass  # Filesystem does not support it (e.g. some network mounts)
+
+
+def _advise(fd, advice_name):
+    advice = getattr(os, advice_name, None)
+    if advice is not None and hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, advice)
+        except OSError:
+            pass
+
+
+def _open_target(filepath, direct):
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    if direct and hasattr(os, "O_DIRECT"):
+        try:
+            return os.open(filepath, flags | os.O_DIRECT, 0o644), True
+        except OSError:
+            pass  # e.g. tmpfs rejects O_DIRECT
+    return os.open(filepath, flags, 0o644), False
+
+
+def _fill(source, view):
+    """Reads into view until it is full or the stream ends. Returns bytes read."""
+    filled = 0
+    while filled < len(view):
+        n = source.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+def _write_all(fd, view):
+    while len(view):
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def download_file(url, folder, filename, buffer_size=DOWNLOAD_BUFFER_SIZE, fsync="none", direct=False):
+    """
+    Streams url into folder/filename through one large reusable buffer.
+    fsync: 'none', 'end' (once after the last write) or 'periodic' (every FSYNC_INTERVAL bytes).
+    direct: open with O_DIRECT where supported, bypassing the page cache.
+    """
+    if buffer_size <= 0:
+        raise ValueError(f"buffer_size must be positive, got {buffer_size}")
     try:
         print(f"Downloading: {filename}")
         print(f"URL: {url}")
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Referer': 'https://haxloppd.com/' # Generic referer might help
-        }
-        
-        with requests.get(url, stream=True, headers=headers, timeout=30) as r:
+        with requests.get(url, stream=True, headers=DOWNLOAD_HEADERS, timeout=30) as r:
             r.raise_for_status()
             
             filepath = os.path.join(folder, filename)
-            
-            with open(filepath, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            encoded = r.headers.get('Content-Encoding', 'identity').lower() != 'identity'
+            expected = 0 if encoded else int(r.headers.get('Content-Length') or 0)
+
+            # For identity bodies read straight from http.client so data lands in our
+            # buffer without urllib3's intermediate bytes copy. _fp is private to urllib3
+            # (present in 1.26 and 2.x); anything else falls back to its public readinto.
+            r.raw.decode_content = True
+            source = r.raw
+            raw_fp = getattr(r.raw, '_fp', None)
+            if not encoded and isinstance(raw_fp, http.client.HTTPResponse):
+                source = raw_fp
+
+            fd, direct = _open_target(filepath, direct)
+            # O_DIRECT needs page-aligned memory and sizes; anonymous mmap is page-aligned.
+            buffer_size = -(-buffer_size // mmap.PAGESIZE) * mmap.PAGESIZE
+            buf = mmap.mmap(-1, buffer_size)
+            view = memoryview(buf)
+            written = 0
+            try:
+                _preallocate(fd, expected)
+                _advise(fd, "POSIX_FADV_SEQUENTIAL")
+                since_sync = 0
+                while True:
+                    n = _fill(source, view)
+                    if not n:
+                        break
+                    if direct and n < buffer_size:
+                        # Final partial block cannot satisfy O_DIRECT alignment
+                        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_DIRECT)
+                        direct = False
+                    _write_all(fd, view[:n])
+                    written += n
+                    since_sync += n
+                    if fsync == "periodic" and since_sync >= FSYNC_INTERVAL:
+                        os.fsync(fd)
+                        since_sync = 0
+                    if n < buffer_size:
+                        break
+
+                if expected and written != expected:
+                    raise IOError(f"Incomplete download: got {written} of {expected} bytes")
+                if fsync in ("end", "periodic"):
+                    os.fsync(fd)
+                    _advise(fd, "POSIX_FADV_DONTNEED")
+            finally:
+                if expected and written != expected:
+                    os.ftruncate(fd, written)  # Drop the unfilled preallocated tail
+                os.close(fd)
             
             print("Download complete.")
             return True
@@ -226,8 +352,31 @@ def download_file(url, folder, filename):
         print(f"Download failed: {e}")
         return False
 
-def process_download_item(dl, url, item_name, download_folder, action):
+def get_episode_number(url):
+    match = re.search(r'episode-(\d+)', url)
+    return int(match.group(1)) if match else 0
+
+def find_episode_links(html):
+    """Returns the episode links in a series/season page's HTML, sorted by episode number."""
+    episode_links = re.findall(r'href="([^"]*/episode/[^"]+)"', html)
+    episode_links = [link for link in list(set(episode_links)) if not link.endswith("/episode/")]
+    episode_links.sort(key=get_episode_number)
+    return episode_links
+
+def get_series_episodes(dl, url):
+    """Returns the episode links found on a series page, sorted by episode number."""
+    resp = dl.scheduler.request(dl.session.get, url, headers=dl.headers)
+    return find_episode_links(resp.text)
+
+def process_download_item(dl, url, item_name, download_folder, action, download_options=None, backend=None,
+                          browser=None, interactive=True, quality_preference=None):
+    """
+    Resolves and downloads (or just links) one movie/episode page.
+    Returns a result dict: name, url, status ('downloaded', 'linked', 'queued', 'skipped' or 'failed'),
+    final_url, quality and path.
+    """
     print(f"\nProcessing: {item_name}...")
+    result = {'name': item_name, 'url': url, 'status': 'failed', 'final_url': None, 'quality': None, 'path': None}
     
     links = dl.get_download_links(url)
     
@@ -245,7 +394,12 @@ def process_download_item(dl, url, item_name, download_folder, action):
                 print(f"Found alternative: {link['server']}")
                 break
         
-        if not multi_link and links:
+        if not multi_link and links and not interactive:
+             print("Skipping as no suitable server found.")
+             result['status'] = 'skipped'
+             return result
+
+        elif not multi_link and links:
              print("Available servers:")
              for i, l in enumerate(links):
                  print(f"{i+1}. {l['server']}")
@@ -260,38 +414,71 @@ def process_download_item(dl, url, item_name, download_folder, action):
                  
              if not multi_link:
                  print("Skipping as no suitable server found.")
-                 return
+                 result['status'] = 'skipped'
+                 return result
 
         elif not multi_link:
              print("No links found at all.")
-             return
+             return result
         
     print(f"Found Download link: {multi_link['url']}")
     
-    final_url, quality_name = resolve_multi_download(multi_link['url'])
+    final_url, quality_name = resolve_multi_download(
+        multi_link['url'], quality_preference, browser=browser, interactive=interactive
+    )
     
     if final_url:
         print(f"Resolved Final URL: {final_url}")
+        result.update(final_url=final_url, quality=quality_name)
         
         if action == 'link':
             print(f"\n[DIRECT LINK] {item_name} ({quality_name}):\n{final_url}\n")
-            return
+            result['status'] = 'linked'
+            return result
 
         safe_q_name = quality_name.replace(' (Constructed)', '').replace(' ', '_')
         # Sanitize filename
         safe_item_name = re.sub(r'[\\/*?:"<>|]', "", item_name).replace(' ', '_')
         filename = f"{safe_item_name}_{safe_q_name}.mp4"
-        download_file(final_url, download_folder, filename)
+        result['path'] = os.path.join(download_folder, filename)
+        if backend is not None:
+            try:
+                # Marked queued first; the backend rewrites it when aria2 reports the outcome
+                result['status'] = 'queued'
+                backend.add(final_url, download_folder, filename, result=result)
+            except (requests.RequestException, Aria2Error) as e:
+                print(f"Could not hand off to aria2: {e}")
+        elif download_file(final_url, download_folder, filename, **(download_options or {})):
+            result['status'] = 'downloaded'
     else:
         print("Failed to resolve final download link.")
+    return result
 
 def main():
     parser = argparse.ArgumentParser(description="EgyDead Downloader")
     parser.add_argument("query", nargs="?", help="Search query")
     parser.add_argument("--mode", choices=["movie", "series"], help="Content type")
     parser.add_argument("--action", choices=["download", "link"], help="Action to perform")
+    parser.add_argument("--buffer-size", type=positive_int, default=DOWNLOAD_BUFFER_SIZE // (1024 * 1024),
+                        help="Download buffer size in MB")
+    parser.add_argument("--fsync", choices=FSYNC_POLICIES, default="none", help="When to fsync downloaded files")
+    parser.add_argument("--direct", action="store_true", help="Write downloads with O_DIRECT where supported")
+    parser.add_argument("--backend", choices=["builtin", "aria2"], default="builtin",
+                        help="Download files ourselves or hand them to aria2 over JSON-RPC")
+    parser.add_argument("--rpc-url", default="http://localhost:6800/jsonrpc", help="aria2 JSON-RPC endpoint")
+    parser.add_argument("--rpc-secret", help="aria2 --rpc-secret token")
+    parser.add_argument("--split", type=positive_int, default=8, help="Connections per file for aria2")
+    parser.add_argument("--batch-size", type=positive_int, default=20, help="Downloads per aria2 submission")
+    parser.add_argument("--max-delay", type=float, default=30.0,
+                        help="Seconds a resolved link may wait before its aria2 batch is sent anyway")
     args = parser.parse_args()
 
+    download_options = {
+        'buffer_size': args.buffer_size * 1024 * 1024,
+        'fsync': args.fsync,
+        'direct': args.direct,
+    }
+
     # 1. Get Mode
     if args.mode:
         mode = args.mode
@@ -371,10 +558,22 @@ def main():
     if action == "download":
         os.makedirs(download_folder, exist_ok=True)
 
+    backend = None
+    if action == "download" and args.backend == "aria2":
+        client = Aria2Client(args.rpc_url, secret=args.rpc_secret)
+        try:
+            version = client.call("aria2.getVersion")
+        except (requests.RequestException, Aria2Error) as e:
+            print(f"Could not reach aria2 at {args.rpc_url}: {e}")
+            return
+        print(f"Handing downloads to aria2 {version.get('version', '')}".rstrip())
+        backend = Aria2Backend(client, headers=DOWNLOAD_HEADERS, split=args.split,
+                               batch_size=args.batch_size, max_delay=args.max_delay)
+
     # 5. Process based on Mode
     if mode == "movie":
         print("Fetching content details...")
-        resp = requests.get(selected_page['url'], headers=dl.headers)
+        resp = dl.scheduler.request(dl.session.get, selected_page['url'], headers=dl.headers)
         
         # Check if it's a collection (e.g. "Series of films...")
         # Often collections list movies similarly to episodes or related items
@@ -416,31 +615,21 @@ def main():
                 choice = int(input("Selection: "))
                 if choice == 0:
                     for item in cleaned_sub_items:
-                         process_download_item(dl, item['url'], item['title'], download_folder, action)
+                         process_download_item(dl, item['url'], item['title'], download_folder, action, download_options, backend)
                 elif 0 < choice <= len(cleaned_sub_items):
                     item = cleaned_sub_items[choice-1]
-                    process_download_item(dl, item['url'], item['title'], download_folder, action)
+                    process_download_item(dl, item['url'], item['title'], download_folder, action, download_options, backend)
                 else:
                     print("Invalid selection.")
             except ValueError:
                 print("Invalid input.")
         else:
             # Treat as single movie
-            process_download_item(dl, selected_page['url'], selected_page['title'], download_folder, action)
+            process_download_item(dl, selected_page['url'], selected_page['title'], download_folder, action, download_options, backend)
     
     elif mode == "series":
         print("Fetching episodes...")
-        resp = requests.get(selected_page['url'], headers=dl.headers)
-        
-        # Try to find episodes
-        episode_links = re.findall(r'href="([^"]*/episode/[^"]+)"', resp.text)
-        episode_links = [link for link in list(set(episode_links)) if not link.endswith("/episode/")]
-        
-        def get_ep_num(url):
-            match = re.search(r'episode-(\d+)', url)
-            return int(match.group(1)) if match else 0
-        
-        episode_links.sort(key=get_ep_num)
+        episode_links = get_series_episodes(dl, selected_page['url'])
         
         if not episode_links:
             print("No episodes found. It might be a movie or the structure is different.")
@@ -468,12 +657,19 @@ def main():
                 continue
                 
             ep_url = episode_links[idx]
-            ep_num = get_ep_num(ep_url)
+            ep_num = get_episode_number(ep_url)
             if ep_num == 0:
                 ep_num = idx + 1
                 
             item_name = f"{selected_page['title']}_Ep{ep_num}"
-            process_download_item(dl, ep_url, item_name, download_folder, action)
+            process_download_item(dl, ep_url, item_name, download_folder, action, download_options, backend)
+
+    # 6. Wait for handed-off downloads
+    if backend is not None:
+        try:
+            backend.wait()
+        except (requests.RequestException, Aria2Error) as e:
+            print(f"Lost contact with aria2: {e}")
 
 if __name__ == "__main__":
     main()
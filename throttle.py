@@ -0,0 +1,165 @@
+"""
+Adaptive per-host request scheduling.
+
+Every host gets its own AIMD concurrency window: it grows by roughly one slot
+per window of healthy responses and is halved as soon as the host answers with
+429/503, a captcha/challenge page or a connection error. Retry-After is
+honored by pausing the whole host, not just the request that got it.
+"""
+import re
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+
+DEFAULT_MAX_WINDOW = 16
+THROTTLE_STATUSES = (429, 503)
+# Challenge interstitials come back as 403/503. Plain pages may still embed Cloudflare's
+# challenge-platform beacon script, so that alone is not treated as a challenge.
+CHALLENGE_STATUSES = (403, 503)
+CHALLENGE_PATTERN = re.compile(
+    r'<title>[^<]*(captcha|attention required|just a moment)'
+    r'|cf-browser-verification|cf-challenge|cf_chl_opt',
+    re.IGNORECASE,
+)
+
+
+def parse_retry_after(value):
+    """Returns the Retry-After delay in seconds (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def throttle_reason(response):
+    """Returns why the host pushed back ('429', 'captcha', ...) or None if the response is healthy."""
+    if (response.status_code in CHALLENGE_STATUSES
+            and 'html' in response.headers.get('Content-Type', '')
+            and CHALLENGE_PATTERN.search(response.text[:8192])):
+        return "captcha"
+    if response.status_code in THROTTLE_STATUSES:
+        return str(response.status_code)
+    return None
+
+
+class HostLimiter:
+    """AIMD concurrency window for a single host."""
+
+    def __init__(self, initial=2, minimum=1, maximum=DEFAULT_MAX_WINDOW):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.active = 0
+        self.epoch = 0
+        self.resume_at = 0.0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        """Blocks until a slot is free and the host is not paused. Returns a token for release()."""
+        with self.cond:
+            while True:
+                wait = self.resume_at - time.monotonic()
+                if wait <= 0 and self.active < int(self.limit):
+                    break
+                self.cond.wait(wait if wait > 0 else None)
+            self.active += 1
+            return self.epoch
+
+    def release(self, token, healthy, pause=None):
+        """
+        healthy: True grows the window, False shrinks it, None leaves it alone.
+        pause: seconds during which no new request may start on this host.
+        """
+        with self.cond:
+            saturated = self.active >= int(self.limit)
+            self.active -= 1
+            if healthy and saturated:
+                # Only a window that was actually full has proven the host can take more
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            elif healthy is False and token == self.epoch:
+                # Requests already in flight when the window was cut report the same
+                # congestion; only the first one may halve it.
+                self.limit = max(self.minimum, self.limit / 2)
+                self.epoch += 1
+            if pause:
+                self.resume_at = max(self.resume_at, time.monotonic() + pause)
+            self.cond.notify_all()
+
+
+class Scheduler:
+    """Routes requests through a HostLimiter per host and retries when the host pushes back."""
+
+    def __init__(self, max_retries=4, backoff=1.0, max_wait=120.0, timeout=30, limiter_factory=None,
+                 **limiter_options):
+        """
+        limiter_factory: called as limiter_factory(host, **limiter_options) to build a host's limiter;
+        anything with HostLimiter's acquire()/release() works. Defaults to an in-process HostLimiter.
+        """
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.limiter_factory = limiter_factory or (lambda host, **options: HostLimiter(**options))
+        self.limiter_options = limiter_options
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def limiter(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = self.limiter_factory(host, **self.limiter_options)
+            return self.hosts[host]
+
+    def _backoff(self, attempt):
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def request(self, send, url, **kwargs):
+        """
+        Calls send(url, **kwargs) (e.g. requests.get or session.post) under the host's window.
+        Returns the last response once retries run out; connection errors are re-raised.
+        A timeout is always set so a stalled connection cannot hold a host slot forever.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        limiter = self.limiter(url)
+        for attempt in range(self.max_retries + 1):
+            token = limiter.acquire()
+            try:
+                response = send(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                limiter.release(token, healthy=False, pause=self._backoff(attempt))
+                if attempt == self.max_retries:
+                    raise
+                continue
+            except BaseException:
+                limiter.release(token, healthy=None)
+                raise
+
+            reason = throttle_reason(response)
+            if reason is None:
+                limiter.release(token, healthy=True)
+                return response
+
+            wait = parse_retry_after(response.headers.get('Retry-After'))
+            if wait is None:
+                wait = self._backoff(attempt)
+            limiter.release(token, healthy=False, pause=min(wait, self.max_wait))
+            if attempt == self.max_retries or wait > self.max_wait:
+                break
+            print(f"Throttled by {urlparse(url).netloc} ({reason}), retrying in {wait:.1f}s...")
+        return response